@@ -1,6 +1,15 @@
 from __future__ import annotations
+import base64
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable
+
+import eventlet
 from flask import Blueprint, request, flash, current_app, jsonify, copy_current_request_context
-from ..tasks.prefetch import prefetch
+from ..config import settings
+from ..tasks.prefetch import prefetch, pregenerate_tts
+from ..services.cache import DiskCache
 from ..services.openai_svc import sanitise, make_json
 from app.extensions import socketio
 
@@ -10,52 +19,134 @@ bp = Blueprint("batch", __name__, url_prefix="/batch")
 # Deck names
 DUPE_DECK = "dupe-check"
 
-@bp.post("/")
-def start() -> jsonify:
-    sid = request.args.get("sid")
-    form = request.form.to_dict()
+# Card maker is called per chunk so a failure only loses that chunk
+CARD_CHUNK = 25
+CARD_CONCURRENCY = 3
+
+
+# Checkpoints of jobs that are never resumed (incl. the pasted blob) expire
+JOB_TTL_H = 24
+
+# job ids with a BatchProcessor running; one run per job at a time
+_RUNNING: set[str] = set()
+
+
+def _checkpoint(job_id: str) -> DiskCache:
+    return DiskCache(f"jobs/{job_id}")
+
+
+def _sweep_jobs() -> None:
+    """Delete checkpoint files of jobs untouched for longer than JOB_TTL_H."""
+    cutoff = time.time() - JOB_TTL_H * 3600
+    for path in (Path(settings.CACHE_DIR) / "jobs").glob("*.json"):
+        try:
+            if path.stem not in _RUNNING and path.stat().st_mtime < cutoff:
+                path.unlink()
+        except OSError:
+            pass
+
+
+def _launch(sid: str, job_id: str, form: dict) -> bool:
+    """Start a run of *job_id*; False if one is already in flight."""
+    if job_id in _RUNNING:
+        return False
+    _RUNNING.add(job_id)
     lang = form.get("lang") or "Unknown"
 
     @copy_current_request_context
     def background_task() -> None:
-        processor = BatchProcessor(current_app.anki, current_app.caches, sid, lang)
-        processor.run(form)
+        try:
+            processor = BatchProcessor(current_app.anki, current_app.caches, sid, lang, job_id)
+            processor.run(form)
+        finally:
+            _RUNNING.discard(job_id)
 
     socketio.start_background_task(background_task)
-    return jsonify(started=True)
+    return True
+
+
+@bp.post("/")
+def start() -> jsonify:
+    sid = request.args.get("sid")
+    form = request.form.to_dict()
+    job_id = uuid.uuid4().hex
+
+    _sweep_jobs()
+    _checkpoint(job_id).set("form", form, ttl=JOB_TTL_H * 3600)
+    _launch(sid, job_id, form)
+    return jsonify(started=True, job=job_id)
+
+
+@bp.post("/resume")
+def resume() -> jsonify:
+    """Re-run a failed job; completed stages are loaded from its checkpoint."""
+    sid = request.args.get("sid")
+    job_id = request.args.get("job") or request.form.get("job", "")
+    form = _checkpoint(job_id).get("form") if job_id.isalnum() else None
+    if form is None:
+        return jsonify(started=False, error="Unknown job"), 404
+
+    if not _launch(sid, job_id, form):
+        return jsonify(started=False, error="Job is already running"), 409
+    return jsonify(started=True, job=job_id)
 
 
 class BatchProcessor:
-    def __init__(self, anki_client, cache_store: dict, sid: str, lang: str) -> None:
+    def __init__(
+        self, anki_client, cache_store: dict, sid: str, lang: str, job_id: str
+    ) -> None:
         self.anki = anki_client
         self.caches = cache_store
         self.sid = sid
         self.lang = lang
+        self.job_id = job_id
+        self.ckpt = _checkpoint(job_id)
 
     def push(self, message: str) -> None:
         """Emit a progress message over Socket.IO."""
         socketio.emit("progress", message)
         socketio.sleep(0)
 
+    def _stage(self, name: str, fn: Callable[[], Any]) -> Any:
+        """Return the checkpointed output of *name*, or compute and save it."""
+        done = self.ckpt.get(name)
+        if done is not None:
+            self.push(f"↻ Resuming: reusing {name}")
+            return done
+        out = fn()
+        self.ckpt.set(name, out)
+        return out
+
     def run(self, form: dict) -> None:
         """
-        Execute the full batch pipeline.
+        Execute the full batch pipeline. Each stage is checkpointed under the
+        job id, so a resumed run only redoes what is missing.
         """
         try:
-            words = self._sanitize(form.get("blob", ""))
-            words = self._unique(words)
-            words, dup_words = self._filter_duplicates(words)
-            cards_raw = self._generate_json(words)
-            cards, dup_cards = self._filter_duplicates(cards_raw)
+            words = self._stage("sanitised", lambda: self._sanitize(form.get("blob", "")))
+            words = self._stage("unique", lambda: self._unique(words))
+            words, dup_words = self._filter_duplicates(words, "words")
+            cards_raw = self._unique_cards(self._generate_json(words))
+            cards, dup_cards = self._filter_duplicates(cards_raw, "cards")
+            self._start_tts_stage(cards, form.get("lang"))
             self._prefetch_media(cards[0], form.get("lang"))
             self._store_results(cards, form)
             total_dups = dup_words + dup_cards
             self.push(f"Removed this many duplicates: {total_dups}")
+            self.ckpt.clear()
             socketio.emit("done", {"next": f"/picker/?sid={self.sid}"}, to=self.sid)
 
-        except BatchError as err:
-            print(f"[BATCH] Error: {err}")
+        except Exception as exc:
+            err = exc if isinstance(exc, BatchError) else BatchError(f"Unexpected error: {exc}")
+            print(f"[BATCH] Error in job {self.job_id}: {err}")
             self.push(f"❌ {err}")
+            if not err.resumable:
+                self.ckpt.clear()
+            socketio.emit("failed", {
+                "job": self.job_id,
+                "error": str(err),
+                "resumable": err.resumable,
+            }, to=self.sid)
 
     def _sanitize(self, blob: str) -> list[str]:
         self.push("Sanitising words…")
@@ -73,48 +164,103 @@ class BatchProcessor:
         self.push(f"→ {len(unique_list)} unique")
         return unique_list
 
+    def _unique_cards(self, cards: list[dict]) -> list[dict]:
+        """
+        Different tokens can lemmatise to the same card ("hund", "dog" → Hund);
+        keep the first card per base.
+        """
+        seen: set[str] = set()
+        unique = []
+        for card in cards:
+            key = card["base"].strip().casefold()
+            if key not in seen:
+                seen.add(key)
+                unique.append(card)
+        if len(unique) < len(cards):
+            self.push(f"→ {len(cards) - len(unique)} card(s) shared a base form")
+        return unique
+
     def _generate_json(self, words: list[str]) -> list[dict]:
         self.push("Calling GPT for card JSON…")
-        try:
-            items = make_json(words, self.lang)
-            self.push(f"→ {len(items)} card(s) received")
-            return items
-        except Exception as exc:
-            raise BatchError(f"Card maker failed: {exc}")
+        chunks = [words[i:i + CARD_CHUNK] for i in range(0, len(words), CARD_CHUNK)]
+        todo = [i for i in range(len(chunks)) if f"cards:{i}" not in self.ckpt]
+        if len(todo) < len(chunks):
+            self.push(f"↻ Resuming: {len(chunks) - len(todo)}/{len(chunks)} chunk(s) done")
+
+        def job(i: int) -> tuple[int, Exception | None]:
+            try:
+                self.ckpt.set(f"cards:{i}", make_json(chunks[i], self.lang))
+                return i, None
+            except Exception as exc:
+                return i, exc
+
+        errors = [exc for _, exc in eventlet.GreenPool(CARD_CONCURRENCY).imap(job, todo) if exc]
+        if errors:
+            raise BatchError(
+                f"Card maker failed on {len(errors)}/{len(chunks)} chunk(s): {errors[0]}"
+            )
+
+        items = [card for i in range(len(chunks)) for card in self.ckpt.get(f"cards:{i}")]
+        self.push(f"→ {len(items)} card(s) received")
+        return items
 
     def _filter_duplicates(
-        self, items: list[str] | list[dict]
+        self, items: list[str] | list[dict], tag: str
     ) -> tuple[list[str] | list[dict], int]:
         self.push("Removing duplicates in Anki…")
-        self.anki.ensure_deck(DUPE_DECK)
-        fresh: list[str] | list[dict] = []
-        dup_count = 0
+        # verdicts: base -> True if already in the collection
+        key = f"dupes:{tag}"
+        verdicts: dict[str, bool] = self.ckpt.get(key) or {}
+        pending = [it for it in items
+                   if (it["base"] if isinstance(it, dict) else it) not in verdicts]
 
-        try:
-            for it in items:
-                base = it["base"] if isinstance(it, dict) else it
-                note_id = self.anki.add_minimal_note(
-                    DUPE_DECK,
-                    current_app.config["ANKI_MODEL"],
-                    base,
-                )
-                if note_id is None:
-                    dup_count += 1
-                    continue
-                self.anki.delete_note(note_id)        # clean up temp note
-                fresh.append(it)
-        finally:
-            self.anki.delete_deck(DUPE_DECK)
+        if pending:
+            try:
+                self.anki.ensure_deck(DUPE_DECK)
+                for it in pending:
+                    base = it["base"] if isinstance(it, dict) else it
+                    note_id = self.anki.add_minimal_note(
+                        DUPE_DECK,
+                        current_app.config["ANKI_MODEL"],
+                        base,
+                    )
+                    if note_id is not None:
+                        self.anki.delete_note(note_id)        # clean up temp note
+                    verdicts[base] = note_id is None
+                    self.ckpt.set(key, verdicts)
+            except Exception as exc:
+                raise BatchError(f"Duplicate check failed: {exc}")
+            finally:
+                try:
+                    self.anki.delete_deck(DUPE_DECK)
+                except Exception as exc:
+                    print(f"[BATCH] Could not delete {DUPE_DECK}: {exc}")
+
+        fresh = [it for it in items
+                 if not verdicts[it["base"] if isinstance(it, dict) else it]]
+        dup_count = len(items) - len(fresh)
 
         if dup_count:
             flash(f"⚠ Skipped {dup_count} duplicate(s).")
         if not fresh:
-            raise BatchError("No new items to add.")
+            raise BatchError("No new items to add.", resumable=False)
 
         self.push(f"→ {len(fresh)} new / {dup_count} duplicate(s)")
         return fresh, dup_count
 
     def _prefetch_media(self, card: dict, lang: str | None) -> None:
+        word = card["base"]
+        media = self.ckpt.get("media")
+        if media is not None:
+            self.push("↻ Resuming: reusing prefetched media")
+            self.caches.setdefault("thumb", {})[word] = media["thumbs"]
+            if media["audio"]:
+                audio = media["audio"]
+                self.caches.setdefault("audio_blob", {})[word] = base64.b64decode(audio["data"])
+                self.caches.setdefault("audio_name", {})[word] = audio["name"]
+                self.caches.setdefault("audio_src", {})[word] = audio["src"]
+            return
+
         self.push("Prefetching media…")
         try:
             prefetch(self.anki, self.caches, card, lang)
@@ -122,6 +268,24 @@ class BatchProcessor:
         except Exception as exc:
             raise BatchError(f"Media prefetch failed: {exc}")
 
+        # audio isn't in Anki yet (save_note uploads it), so checkpoint the bytes
+        blob = self.caches["audio_blob"].get(word)
+        self.ckpt.set("media", {
+            "thumbs": self.caches["thumb"].get(word, []),
+            "audio": blob and {
+                "name": self.caches["audio_name"][word],
+                "src":  self.caches["audio_src"][word],
+                "data": base64.b64encode(blob).decode(),
+            },
+        })
+
+    def _start_tts_stage(self, cards: list[dict], lang: str | None) -> None:
+        """Kick off audio pre-generation for the rest of the batch; not awaited."""
+        if len(cards) > 1:
+            socketio.start_background_task(
+                pregenerate_tts, self.anki, self.caches, cards[1:], lang
+            )
+
     def _store_results(self, cards: list[dict], form: dict) -> None:
         self.caches["jobs"][self.sid] = {
             "cards": cards,
@@ -132,4 +296,7 @@ class BatchProcessor:
 
 class BatchError(Exception):
     """Indicates a failure in the batch processing pipeline."""
-    pass
+
+    def __init__(self, message: str, *, resumable: bool = True) -> None:
+        super().__init__(message)
+        self.resumable = resumable
@@ -1,12 +1,31 @@
-from flask import Blueprint, render_template, current_app
+from flask import Blueprint, render_template, current_app, jsonify
+from ..services.audio_service import forvo_budget
 
 bp = Blueprint("index", __name__)
 
 @bp.get("/")
 def index():
-    decks = current_app.anki.deck_names()
+    anki_ready = current_app.anki.check()
+    decks: list[str] = []
+    if anki_ready:
+        try:
+            decks = current_app.anki.deck_names()
+        except Exception as err:
+            print(f"[ANKI] deckNames failed: {err!r}")
+            anki_ready = False
 
     return render_template(
         "index.html",
         decks=decks,
-    )
\ No newline at end of file
+        anki_ready=anki_ready,
+    )
+
+
+@bp.get("/health")
+def health():
+    """Readiness of external services; Anki is re-probed if it was down."""
+    return jsonify(
+        ok=True,
+        anki=current_app.anki.check(),
+        forvo_remaining=forvo_budget().remaining(),
+    )
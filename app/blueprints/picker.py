@@ -1,13 +1,83 @@
 from __future__ import annotations
-from flask import Blueprint, current_app, redirect, render_template, request, url_for, flash
+from flask import Blueprint, current_app, redirect, render_template, request, url_for, flash, jsonify
 from ..tasks.prefetch import prefetch
-from ..tasks.save_note import save_note
+from ..tasks.save_note import save_note, spool_upload
 from ..models.card import CardData
 
 from app.extensions import socketio
 
 bp = Blueprint("picker", __name__, url_prefix="/picker")
 
+# how many upcoming cards the JSON API prefetches and returns
+LOOKAHEAD = 3
+MAX_LOOKAHEAD = 10
+
+
+def _prefetch_ahead(job: dict, idx: int, ahead: int) -> None:
+    """Start prefetch for cards idx..idx+ahead that aren't cached or in flight."""
+    cards = job["cards"]
+    thumbs = current_app.caches.get("thumb", {})
+    started = job.setdefault("prefetching", set())
+
+    for card in cards[idx: idx + ahead + 1]:
+        base = card["base"]
+        if base in thumbs or base in started:
+            continue
+        started.add(base)
+        socketio.start_background_task(
+            _run_prefetch,
+            current_app.anki,
+            current_app.caches,
+            card,
+            job,
+        )
+
+
+def _run_prefetch(anki, caches: dict, card: dict, job: dict) -> None:
+    """prefetch() for the picker; on failure, let the next state poll retry it."""
+    try:
+        prefetch(anki, caches, card, job["lang"])
+    except Exception as exc:
+        print(f"[PICKER] prefetch failed for '{card['base']}': {exc!r}")
+        job["prefetching"].discard(card["base"])
+
+
+def _queue_save(job: dict, idx: int) -> None:
+    """Hand the current request's selection for card *idx* to save_note."""
+    sel_urls = [u for u in request.form.getlist("url") if u and u != "on"]
+    uploads  = [(f.filename, spool_upload(f)) for f in request.files.getlist("file") if f]
+    rec      = request.files.get("audio")
+    rec_path = spool_upload(rec) if rec else ""
+    rec_b64  = request.form.get("audio_b64", "")
+
+    socketio.start_background_task(
+        save_note,
+        deck       = job["deck"],
+        anki_model = current_app.config["ANKI_MODEL"],
+        anki       = current_app.anki,
+        caches     = current_app.caches,
+        card_dict  = job["cards"][idx],
+        sel_urls   = sel_urls,
+        uploads    = uploads,
+        rec_b64    = rec_b64,
+        rec_path   = rec_path,
+        lang       = job["lang"],
+    )
+
+
+def _card_state(idx: int, raw: dict) -> dict:
+    card = CardData.from_dict(raw)
+    caches = current_app.caches
+    return {
+        "idx":    idx,
+        "word":   card.base,
+        "trans":  card.translation,
+        "gram":   card.grammar,
+        # None = prefetch still running, [] = no results
+        "thumbs": caches.get("thumb", {}).get(card.base),
+        "audio":  bool(caches.get("audio_blob", {}).get(card.base)),
+    }
+
 
 @bp.route("/", methods=["GET", "POST"])
 def step():
@@ -26,22 +96,7 @@ def step():
         action = request.form.get("action", "keep")
 
         if action == "keep":
-            sel_urls = [u for u in request.form.getlist("url") if u and u != "on"]
-            uploads  = [(f.filename, f.read()) for f in request.files.getlist("file")]
-            rec_b64  = request.form.get("audio_b64", "")
-
-            socketio.start_background_task(
-                save_note,
-                deck       = job["deck"],
-                anki_model = current_app.config["ANKI_MODEL"],
-                anki       = current_app.anki,
-                caches     = current_app.caches,
-                card_dict  = cards[idx],
-                sel_urls   = sel_urls,
-                uploads    = uploads,
-                rec_b64    = rec_b64,
-                lang       = job["lang"],
-            )
+            _queue_save(job, idx)
             flash(f"Added “{cards[idx]['base']}” (processing in background)…")
         else:
             flash(f"Skipped “{cards[idx]['base']}”.")
@@ -60,16 +115,7 @@ def step():
     card = CardData.from_dict(cards[idx])
     urls = current_app.caches["thumb"].get(card.base, [])
 
-    if idx + 1 < len(cards):
-        next_card = cards[idx + 1]
-        if next_card["base"] not in current_app.caches.get("thumb", {}):
-            socketio.start_background_task(
-                prefetch,
-                current_app.anki,
-                current_app.caches,
-                next_card,
-                job["lang"],
-            )
+    _prefetch_ahead(job, idx + 1, 0)
 
     return render_template(
         "picker.html",
@@ -77,4 +123,58 @@ def step():
         trans= card.translation,
         gram = card.grammar,
         urls = urls,
-    )
\ No newline at end of file
+        sid  = sid,
+        idx  = idx,
+        lookahead = LOOKAHEAD,
+    )
+
+
+# ────────── JSON API (used by picker.js) ──────────────────────────
+@bp.get("/api/state")
+def api_state():
+    """Current card plus the next ``ahead`` cards, prefetching as needed."""
+    sid = request.args.get("sid")
+    job = current_app.caches["jobs"].get(sid)
+    if job is None:
+        return jsonify(error="Import job not found"), 404
+
+    ahead = max(0, min(request.args.get("ahead", LOOKAHEAD, type=int), MAX_LOOKAHEAD))
+    idx = job.setdefault("idx", 0)
+    _prefetch_ahead(job, idx, ahead)
+
+    cards = job["cards"]
+    return jsonify(
+        idx   = idx,
+        total = len(cards),
+        cards = [_card_state(i, cards[i])
+                 for i in range(idx, min(idx + ahead + 1, len(cards)))],
+    )
+
+
+@bp.post("/api/step")
+def api_step():
+    """
+    Keep or skip card ``idx``; returns as soon as the save is queued.
+    ``idx`` must match the job's position so a retried POST can't skip twice.
+    """
+    sid = request.args.get("sid")
+    job = current_app.caches["jobs"].get(sid)
+    if job is None:
+        return jsonify(error="Import job not found"), 404
+
+    cards = job["cards"]
+    idx = job.setdefault("idx", 0)
+    if request.form.get("idx", type=int) != idx:
+        return jsonify(error="Out of step", idx=idx), 409
+
+    if request.form.get("action", "keep") == "keep":
+        _queue_save(job, idx)
+
+    job["idx"] += 1
+    done = job["idx"] >= len(cards)
+    if done:
+        current_app.caches["jobs"].pop(sid, None)
+    else:
+        _prefetch_ahead(job, job["idx"], LOOKAHEAD)
+
+    return jsonify(ok=True, idx=job["idx"], done=done)
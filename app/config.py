@@ -13,9 +13,25 @@ class Settings(BaseSettings):
     # Google CSE -----------------------------------------------------
     GOOGLE_CSE_KEY: SecretStr
     GOOGLE_CSE_CX: str
+    GOOGLE_CSE_ENDPOINT: str = "https://customsearch.googleapis.com/customsearch/v1"
 
     # Forvo ----------------------------------------------------------
     FORVO_API_KEY: SecretStr
+    FORVO_ENDPOINT: str = "https://apifree.forvo.com"
+    FORVO_DAILY_LIMIT: int = 500        # free plan: 500 requests / day
+    FORVO_BUDGET_RESERVE: int = 10      # below this, go straight to TTS
+    FORVO_HIT_TTL_H: float = 12         # clip URLs are signed and go stale
+    FORVO_MISS_TTL_H: float = 24 * 3
+
+    # Card maker -----------------------------------------------------
+    CARDMAKER_FORMAT: str = "objects"   # "objects" | "compact" (schema-enforced rows)
+
+    # TTS ------------------------------------------------------------
+    TTS_PREGEN: str = "misses"          # "all" | "misses" | "off"
+    TTS_CONCURRENCY: int = 4
+
+    # Disk cache -----------------------------------------------------
+    CACHE_DIR: str = ".cache"
 
     # Executor -------------------------------------------------------
     MAX_WORKERS: int = 6
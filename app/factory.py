@@ -19,4 +19,7 @@ def create_app() -> Flask:
     app.caches = caches
     register_blueprints(app)
     socketio.init_app(app)
-    return app
\ No newline at end of file
+
+    # don't hold up startup on Anki: probe (and launch it) in the background
+    socketio.start_background_task(app.anki.probe, sleep=socketio.sleep)
+    return app
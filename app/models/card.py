@@ -1,5 +1,27 @@
 from dataclasses import dataclass
-from typing import Iterable
+from typing import Any, Iterable
+
+# wire order of the card-maker output; compact rows are positional in this order
+CARD_KEYS = ("base", "grammar", "translation", "example", "example-translation", "keyword")
+REQUIRED_KEYS = ("base", "translation", "keyword")
+
+
+def card_from_wire(raw: Any) -> dict | None:
+    """
+    Validate one card-maker item – an object or a compact positional row –
+    and return the dict ``CardData.from_dict`` expects, or ``None`` if bad.
+    """
+    if isinstance(raw, (list, tuple)):
+        if len(raw) != len(CARD_KEYS):
+            return None
+        raw = dict(zip(CARD_KEYS, raw))
+    if not isinstance(raw, dict):
+        return None
+    if not all(isinstance(raw.get(k), str) for k in CARD_KEYS):
+        return None
+    if not all(raw[k].strip() for k in REQUIRED_KEYS):
+        return None
+    return {k: raw[k] for k in CARD_KEYS}
 
 @dataclass(frozen=True, slots=True)
 class CardData:
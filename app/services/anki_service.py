@@ -4,7 +4,7 @@ from hashlib import md5
 import subprocess
 import sys
 import time
-from typing import Any
+from typing import Any, Callable
 
 import requests
 
@@ -19,40 +19,73 @@ class AnkiClient:
         self.url = endpoint
         self.timeout = timeout
         self.session = requests.Session()  # keep TCP connection open
-        self._ensure_anki_running()
+        self.ready = False                 # tracks the last RPC's connectivity
 
-    def _ensure_anki_running(self, retries: int = 5, delay: float = 1.0) -> None:
+    def probe(
+        self,
+        retries: int = 30,
+        delay: float = 1.0,
+        *,
+        sleep: Callable[[float], Any] = time.sleep,
+    ) -> bool:
         """
-        Make sure AnkiConnect is reachable. If not, launch Anki once and retry.
+        Check AnkiConnect is reachable. If not, launch Anki once and retry.
+
+        Meant to run as a background task; pass ``sleep=socketio.sleep`` so the
+        waits yield to the event loop. The RPC itself only yields once the
+        process is monkey-patched (see ``scripts/run.py``).
         """
         for attempt in range(retries):
             try:
-                self._rpc("version")
-                return
+                self._rpc("version", timeout=2)
+                print(f"[ANKI] AnkiConnect ready (attempt {attempt+1}/{retries})")
+                return True
             except Exception:
                 if attempt == 0:
                     print("[ANKI] AnkiConnect not reachable, launching Anki…")
-                    try:
-                        if sys.platform == "darwin":
-                            subprocess.Popen(["open", "-a", "Anki"])
-                        elif sys.platform.startswith("win"):
-                            # Windows: rely on PATH or file association
-                            subprocess.Popen(["cmd", "/c", "start", "", "anki"])
-                        else:
-                            # Linux: assume 'anki' is in PATH
-                            subprocess.Popen(["anki"])
-                    except Exception as launch_err:
-                        print(f"[ANKI] Failed to launch Anki: {launch_err!r}")
-                print(f"[ANKI] Waiting {delay:.1f}s for AnkiConnect (attempt {attempt+1}/{retries})")
-                time.sleep(delay)
-
-        raise RuntimeError("Unable to connect to AnkiConnect after launching Anki.")
+                    self._launch_anki()
+                sleep(delay)
+
+        print(f"[ANKI] AnkiConnect still unreachable after {retries} attempt(s)")
+        return False
 
+    def check(self, timeout: float = 1.0) -> bool:
+        """
+        ``ready``, re-checked with one quick ``version`` call if the last RPC
+        failed, so Anki starting late (or coming back) is picked up.
+        """
+        if not self.ready:
+            try:
+                self._rpc("version", timeout=timeout)
+            except Exception:
+                pass
+        return self.ready
+
+    @staticmethod
+    def _launch_anki() -> None:
+        try:
+            if sys.platform == "darwin":
+                subprocess.Popen(["open", "-a", "Anki"])
+            elif sys.platform.startswith("win"):
+                # Windows: rely on PATH or file association
+                subprocess.Popen(["cmd", "/c", "start", "", "anki"])
+            else:
+                # Linux: assume 'anki' is in PATH
+                subprocess.Popen(["anki"])
+        except Exception as launch_err:
+            print(f"[ANKI] Failed to launch Anki: {launch_err!r}")
 
     # ---------- core RPC -----------------------------------------
-    def _rpc(self, action: str, **params: Any) -> Any:
+    def _rpc(self, action: str, *, timeout: float | None = None, **params: Any) -> Any:
         payload = {"action": action, "version": 6, "params": params}
-        res = self.session.post(self.url, json=payload, timeout=self.timeout).json()
+        try:
+            res = self.session.post(
+                self.url, json=payload, timeout=timeout or self.timeout
+            ).json()
+        except (requests.ConnectionError, requests.Timeout):
+            self.ready = False      # Anki quit (or never started)
+            raise
+        self.ready = True
         if res.get("error"):
             raise RuntimeError(res["error"])
         return res["result"]
@@ -86,6 +119,12 @@ class AnkiClient:
         b64 = base64.b64encode(raw).decode()
         return self._rpc("storeMediaFile", filename=fname, data=b64)
 
+    def has_media(self, fname: str) -> bool:
+        try:
+            return fname in self._rpc("getMediaFilesNames", pattern=fname)
+        except Exception:
+            return False
+
     def ensure_deck(self, name: str) -> None:
         if name not in self.deck_names():
             self._rpc("createDeck", deck=name)
@@ -118,8 +157,22 @@ class AnkiClient:
         self._rpc("deleteDecks", decks=[name], cardsToo=True)
 
     # batch
+    @staticmethod
+    def _encode_media(actions: list[dict]) -> list[dict]:
+        """
+        storeMediaFile actions may carry raw bytes; base64 them here, once,
+        right before they go over the wire.
+        """
+        out = []
+        for a in actions:
+            data = a.get("params", {}).get("data")
+            if a["action"] == "storeMediaFile" and isinstance(data, (bytes, bytearray)):
+                a = {**a, "params": {**a["params"], "data": base64.b64encode(data).decode()}}
+            out.append(a)
+        return out
+
     def multi(self, actions):
         print("[ANKI] multi call:", [a["action"] for a in actions])
-        out = self._rpc("multi", actions=actions)
+        out = self._rpc("multi", actions=self._encode_media(actions))
         print("[ANKI] multi result:", out)
         return out
\ No newline at end of file
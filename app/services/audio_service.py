@@ -1,16 +1,24 @@
 """Forvo-based audio retrieval with basic mastering."""
 from __future__ import annotations
 import tempfile
+import threading
+from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO
 from urllib.parse import quote_plus
 
 import requests
-from pydub import AudioSegment, effects
+from eventlet import tpool
 
 from ..config import settings
+from .cache import DiskCache
+
+if TYPE_CHECKING:
+    from pydub import AudioSegment
 
 FORVO_URL = (
-    "https://apifree.forvo.com/key/{key}/format/json/"
+    settings.FORVO_ENDPOINT + "/key/{key}/format/json/"
     "action/word-pronunciations/word/{word}/language/{lang}"
 )
 
@@ -19,44 +27,194 @@ GAP_MS = 300
 HPF_CUTOFF_HZ = 100
 LPF_CUTOFF_HZ = 7500
 PEAK_TARGET_DBFS = -3.0
+EXPORT_BITRATE = "192k"
+
+
+@lru_cache(maxsize=1)
+def _session() -> requests.Session:
+    """Shared Forvo session, created on first lookup."""
+    return requests.Session()
+
+
+class ForvoBudget:
+    """
+    Counts Forvo API requests against the daily quota (UTC day), persisted
+    so restarts don't reset the tally.
+    """
+
+    KEY = "budget"
+
+    def __init__(self, store: DiskCache, limit: int, reserve: int) -> None:
+        self.store = store
+        self.limit = limit
+        self.reserve = reserve
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now(timezone.utc).date().isoformat()
+
+    def used(self) -> int:
+        state = self.store.get(self.KEY) or {}
+        return state.get("used", 0) if state.get("day") == self._today() else 0
+
+    def remaining(self) -> int:
+        return max(self.limit - self.used(), 0)
+
+    def try_spend(self) -> bool:
+        """Reserve one request; False once we're down to the reserve."""
+        with self._lock:
+            used = self.used()
+            if self.limit - used <= self.reserve:
+                return False
+            self.store.set(self.KEY, {"day": self._today(), "used": used + 1})
+            return True
+
+    def exhaust(self) -> None:
+        """Forvo told us the quota is gone; stop asking until tomorrow."""
+        with self._lock:
+            self.store.set(self.KEY, {"day": self._today(), "used": self.limit})
+
+
+@lru_cache(maxsize=1)
+def _lookups() -> DiskCache:
+    return DiskCache("forvo_lookups")
+
+
+@lru_cache(maxsize=1)
+def forvo_budget() -> ForvoBudget:
+    return ForvoBudget(
+        DiskCache("forvo_budget"),
+        limit=settings.FORVO_DAILY_LIMIT,
+        reserve=settings.FORVO_BUDGET_RESERVE,
+    )
 
 
 def _fetch_clips(lang: str, word: str, top: int = 3) -> list[str]:
+    """
+    Clip URLs for *word*, best-rated first. Hits and misses are cached on
+    disk; a low daily budget short-circuits to ``[]`` (i.e. use TTS).
+    """
+    key = f"{lang}:{word}"
+    cached = _lookups().get(key)
+    if cached is not None:
+        print(f"[FORVO] cache {'hit' if cached else 'miss'} for '{word}' in {lang}")
+        return cached[:top]
+
+    budget = forvo_budget()
+    if not budget.try_spend():
+        print(f"[FORVO] budget low ({budget.remaining()} left), skipping '{word}'")
+        return []
+
     url = FORVO_URL.format(
         key=settings.FORVO_API_KEY.get_secret_value(),
         word=quote_plus(word),
         lang=lang,
     )
-    data = requests.get(url, timeout=15).json()
+    try:
+        data = _session().get(url, timeout=15).json()
+    except (requests.RequestException, ValueError) as err:
+        # transient (or quota page that isn't JSON) – don't cache, just fall back
+        print(f"[FORVO] request failed for '{word}': {err}")
+        return []
+
+    if not isinstance(data, dict) or "items" not in data:
+        # Forvo answers a spent key with e.g. ["Limit/day reached."]; any other
+        # error is treated as transient – not cached, and the budget stays on
+        if "limit" in str(data).lower():
+            print(f"[FORVO] daily limit reached: {data!r}")
+            budget.exhaust()
+        else:
+            print(f"[FORVO] error response for '{word}': {data!r}")
+        return []
+
     items = sorted(data.get("items", []), key=lambda x: x.get("rate", 0), reverse=True)
     print(f"Fetched {len(items)} clips for '{word}' in {lang}")
-    return [itm["pathmp3"] for itm in items[:top]]
+    clips = [itm["pathmp3"] for itm in items[:top]]
+
+    ttl_h = settings.FORVO_HIT_TTL_H if clips else settings.FORVO_MISS_TTL_H
+    _lookups().set(key, clips, ttl=ttl_h * 3600)
+    return clips
+
+
+def forget_clips(lang: str, word: str) -> None:
+    """Drop a cached lookup, e.g. when its clip URLs have gone stale."""
+    _lookups().pop(f"{lang}:{word}")
 
 
 def _process(seg: AudioSegment) -> AudioSegment:
+    from pydub import effects
+
     seg = seg.high_pass_filter(HPF_CUTOFF_HZ)
     seg = seg.low_pass_filter(LPF_CUTOFF_HZ)
     return effects.normalize(seg, headroom=-PEAK_TARGET_DBFS)
 
 
 def get_audio_blob(lang: str, word: str):
+    cached = bool(_lookups().get(f"{lang}:{word}"))
     clips = _fetch_clips(lang, word)
-    if not clips:
+    out_bytes = _download_clips(word, clips)
+    if clips and out_bytes is None and cached:
+        # cached clip URLs expired – one fresh (budgeted) lookup before TTS
+        print(f"[FORVO] cached clips for '{word}' are stale, re-querying")
+        forget_clips(lang, word)
+        clips = _fetch_clips(lang, word)
+        out_bytes = _download_clips(word, clips)
+
+    if not out_bytes:
+        if clips:
+            # unusable URLs – forget them so the next run re-queries
+            forget_clips(lang, word)
         return "", None
 
+    out_name = f"{word.replace(' ', '_')}_{lang}.mp3"
+    return out_name, out_bytes
+
+
+def _download_clips(word: str, clips: list[str]) -> bytes | None:
+    """Download and master *clips*; ``None`` if none could be fetched or decoded."""
+    if not clips:
+        return None
+
     with tempfile.TemporaryDirectory() as tmp:
-        segs = []
+        paths = []
         for idx, url in enumerate(clips, 1):
             path = Path(tmp) / f"raw_{idx}.mp3"
-            data = requests.get(url, timeout=20).content
-            path.write_bytes(data)
+            try:
+                res = _session().get(url, timeout=20)
+                res.raise_for_status()
+                path.write_bytes(res.content)
+                paths.append(path)
+            except Exception as err:
+                print(f"[FORVO] clip download failed for '{word}': {err}")
+
+        # ffmpeg + pydub's pure-Python filters would stall the hub; use a real thread
+        return tpool.execute(_master_clips, paths) if paths else None
+
+
+def _master_clips(paths: list[Path]) -> bytes | None:
+    """Master and join downloaded clips with a short gap; ``None`` if none decode."""
+    from pydub import AudioSegment
+
+    segs = []
+    for path in paths:
+        try:
             segs.append(_process(AudioSegment.from_file(path)))
+        except Exception as err:
+            print(f"[FORVO] clip decode failed ({path.name}): {err}")
+    if not segs:
+        return None
+
+    gap = AudioSegment.silent(GAP_MS)
+    combined = segs[0]
+    for seg in segs[1:]:
+        combined += gap + seg
+    return combined.export(format="mp3", bitrate=EXPORT_BITRATE).read()
+
 
-        gap = AudioSegment.silent(GAP_MS)
-        combined = segs[0]
-        for seg in segs[1:]:
-            combined += gap + seg
+def master_recording(src: str | Path | BinaryIO) -> bytes:
+    """Transcode a user recording (browser WebM/Opus etc.) to mastered MP3, like Forvo clips."""
+    from pydub import AudioSegment
 
-        out_name = f"{word.replace(' ', '_')}_{lang}.mp3"
-        out_bytes = combined.export(format="mp3", bitrate="192k").read()
-        return out_name, out_bytes
\ No newline at end of file
+    seg = _process(AudioSegment.from_file(src))
+    return seg.export(format="mp3", bitrate=EXPORT_BITRATE).read()
\ No newline at end of file
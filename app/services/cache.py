@@ -0,0 +1,80 @@
+"""Small JSON-on-disk key/value store with optional per-entry TTL."""
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from ..config import settings
+
+
+class DiskCache:
+    """
+    A dict persisted as one JSON file. Entries may carry an expiry; expired
+    entries read as missing. Writes go through a temp file + rename so a
+    crash never leaves a half-written cache behind.
+    """
+
+    def __init__(self, name: str, root: str | Path | None = None) -> None:
+        root = Path(root or settings.CACHE_DIR)
+        self.path = root / f"{name}.json"
+        self._lock = threading.Lock()
+        self._data: dict[str, dict] | None = None
+
+    # ---------- internals ----------------------------------------
+    def _load(self) -> dict[str, dict]:
+        if self._data is None:
+            try:
+                self._data = json.loads(self.path.read_text(encoding="utf-8"))
+            except (FileNotFoundError, ValueError):
+                self._data = {}
+        return self._data
+
+    def _flush(self) -> None:
+        # drop expired entries so the file doesn't grow without bound
+        now = time.time()
+        self._data = {
+            k: e for k, e in self._data.items()
+            if e.get("exp") is None or e["exp"] >= now
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self._data, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    # ---------- public API ---------------------------------------
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._load().get(key)
+            if entry is None:
+                return default
+            exp = entry.get("exp")
+            if exp is not None and exp < time.time():
+                return default
+            return entry["v"]
+
+    def __contains__(self, key: str) -> bool:
+        sentinel = object()
+        return self.get(key, sentinel) is not sentinel
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        """Store *value*; *ttl* is in seconds, ``None`` keeps it forever."""
+        with self._lock:
+            entry = {"v": value}
+            if ttl is not None:
+                entry["exp"] = time.time() + ttl
+            self._load()[key] = entry
+            self._flush()
+
+    def clear(self) -> None:
+        """Forget everything, including the file on disk."""
+        with self._lock:
+            self._data = {}
+            self.path.unlink(missing_ok=True)
+
+    def pop(self, key: str) -> None:
+        with self._lock:
+            if self._load().pop(key, None) is not None:
+                self._flush()
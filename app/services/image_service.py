@@ -1,13 +1,24 @@
 """Google CSE image search abstraction."""
+from functools import lru_cache
 from typing import List
 import requests
 
 from ..config import settings
 
-CSE_URL = "https://customsearch.googleapis.com/customsearch/v1"
+CSE_URL = settings.GOOGLE_CSE_ENDPOINT
 
 
-def google_thumbs(query: str, k: int = 20) -> List[str]:
+@lru_cache(maxsize=1)
+def _session() -> requests.Session:
+    """Shared CSE session, created on first search."""
+    return requests.Session()
+
+
+def google_images(query: str, k: int = 20) -> List[dict]:
+    """
+    Image results with the metadata CSE already returns: ``link``, ``thumb``
+    (Google's small thumbnail), ``size`` in bytes, ``width`` and ``height``.
+    """
     params = {
         "key": settings.GOOGLE_CSE_KEY.get_secret_value(),
         "cx": settings.GOOGLE_CSE_CX,
@@ -17,11 +28,26 @@ def google_thumbs(query: str, k: int = 20) -> List[str]:
         "num": 10,
     }
     try:
-        res = requests.get(CSE_URL, params=params, timeout=20)
+        res = _session().get(CSE_URL, params=params, timeout=20)
         res.raise_for_status()
         data = res.json()
-        return [it["link"] for it in data.get("items", [])][:k]
     except requests.RequestException as err:
         # keep the app running even if Google CSE flakes out
         print(f"Google CSE request failed: {err}")
-        return []
\ No newline at end of file
+        return []
+
+    out = []
+    for it in data.get("items", [])[:k]:
+        img = it.get("image", {})
+        out.append({
+            "link":   it["link"],
+            "thumb":  img.get("thumbnailLink", ""),
+            "size":   int(img.get("byteSize") or 0),
+            "width":  int(img.get("width") or 0),
+            "height": int(img.get("height") or 0),
+        })
+    return out
+
+
+def google_thumbs(query: str, k: int = 20) -> List[str]:
+    return [img["link"] for img in google_images(query, k)]
@@ -2,83 +2,181 @@ import os
 import json
 import time
 import pathlib
-from openai import OpenAI
-from app.extensions import socketio
+from functools import lru_cache
+
+import eventlet
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from app.extensions import socketio
+from ..config import settings
+from ..models.card import card_from_wire
+from .sanitiser import chunk, dedupe, normalise, presanitise
 
 HERE    = pathlib.Path(__file__).resolve().parent
 PROJECT = HERE.parent.parent
 
-SANITISE_INSTRUCTIONS = (PROJECT / "instructions" / "sanitise.txt").read_text()
-JSON_INSTRUCTIONS     = (PROJECT / "instructions" / "json_card.txt").read_text()
-
 SANITISER_MODEL   = "gpt-4o-mini-2024-07-18"
 SANITISER_TEMP    = 0.3
+SANITISER_CHUNK_CHARS = 4000     # ~1–2k tokens of input per request
+SANITISER_CONCURRENCY = 3
 CARDMAKER_MODEL   = "gpt-4.1-mini"
 CARDMAKER_TEMP    = 0.1
+CARDMAKER_SCHEMA  = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "cards",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "cards": {
+                    "type": "array",
+                    "items": {"type": "array", "items": {"type": "string"}},
+                },
+            },
+            "required": ["cards"],
+            "additionalProperties": False,
+        },
+    },
+}
 
 TTS_MODEL   = "gpt-4o-mini-tts"
 TTS_VOICE   = "ash"
 TTS_SPEED   = 1.0
 TTS_FORMAT  = "mp3"
 
+@lru_cache(maxsize=1)
+def _client():
+    """Create the OpenAI client on first use (the SDK import alone is slow)."""
+    from openai import OpenAI
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+
+@lru_cache(maxsize=None)
+def _instructions(name: str) -> str:
+    return (PROJECT / "instructions" / name).read_text()
+
+
 def _push(msg: str) -> None:
     socketio.emit("progress", msg)
 
-def sanitise(raw: str, language: str) -> list[str]:
-    _push("Sanitising word list…")
-    t0 = time.time()
-
-    instr = SANITISE_INSTRUCTIONS.replace("{Language}", language)
-    resp = client.chat.completions.create(
+def _sanitise_llm(fragments: list[str], language: str) -> list[str]:
+    instr = _instructions("sanitise.txt").replace("{Language}", language)
+    resp = _client().chat.completions.create(
         model=SANITISER_MODEL,
         temperature=SANITISER_TEMP,
         messages=[
             {"role": "system",  "content": instr},
-            {"role": "user",    "content": raw},
+            {"role": "user",    "content": "; ".join(fragments)},
         ],
     )
+    text = resp.choices[0].message.content.strip()
+    print(f"[SANITISER] Response: {text}")
+    return [tok.strip() for tok in text.split(";") if tok.strip()]
 
-    elapsed = time.time() - t0
-    text    = resp.choices[0].message.content.strip()
-    toks    = [tok.strip() for tok in text.split(";") if tok.strip()]
 
+def sanitise(raw: str, language: str) -> list[str]:
+    """
+    Split a pasted blob into head-words. Clean tokens are handled locally;
+    only ambiguous fragments go to the model, in context-sized chunks.
+    """
+    _push("Sanitising word list…")
+    t0 = time.time()
+
+    toks, ambiguous = presanitise(raw)
+    if ambiguous:
+        chunks = chunk(ambiguous, SANITISER_CHUNK_CHARS)
+        noun = "entry" if len(ambiguous) == 1 else "entries"
+        _push(f"Asking AI to split {len(ambiguous)} ambiguous {noun}…")
+        pool = eventlet.GreenPool(size=SANITISER_CONCURRENCY)
+        for out in pool.imap(lambda c: _sanitise_llm(c, language), chunks):
+            toks.extend(normalise(tok) for tok in out)
+        toks = dedupe(toks)
+
+    elapsed = time.time() - t0
     _push(f"✔ Sanitised → {len(toks)} unique token(s)")
-    print(f"[SANITISER] Response: {text} (took {elapsed:.2f}s)")
+    print(f"[SANITISER] {len(toks)} token(s), {len(ambiguous)} sent to model "
+          f"(took {elapsed:.2f}s)")
     return toks
 
 
-def make_json(words: list[str], lang: str) -> list[dict]:
-    _push("Asking AI to create JSON card(s)…")
-    t0 = time.time()
+def _request_cards(words: list[str], lang: str) -> list:
+    """One card-maker round-trip; returns the raw (unvalidated) item list."""
+    compact = settings.CARDMAKER_FORMAT == "compact"
+    name = "json_card_compact.txt" if compact else "json_card.txt"
+    instr = _instructions(name).replace("{Language}", lang)
+    extra = {"response_format": CARDMAKER_SCHEMA} if compact else {}
 
-    instr = JSON_INSTRUCTIONS.replace("{Language}", lang)
-    prompt = ", ".join(words)
-
-    resp = client.chat.completions.create(
+    resp = _client().chat.completions.create(
         model=CARDMAKER_MODEL,
         temperature=CARDMAKER_TEMP,
         messages=[
             {"role": "system", "content": instr},
-            {"role": "user",   "content": prompt},
+            {"role": "user",   "content": ", ".join(words)},
         ],
+        **extra,
     )
-
-    elapsed  = time.time() - t0
     json_str = resp.choices[0].message.content.strip()
-    print(f"[CARDMAKER] Response received (took {elapsed:.2f}s)")
+    print(f"Response JSON: {json_str}")
+
+    # tolerate ```json fences the prompt asks the model not to add
+    if json_str.startswith("```"):
+        json_str = json_str.strip("`").removeprefix("json").strip()
+    data = json.loads(json_str)
+    if isinstance(data, dict):
+        data = data.get("cards")
+    if not isinstance(data, list):
+        raise json.JSONDecodeError("expected a JSON array of cards", json_str, 0)
+    return data
+
+
+def make_json(words: list[str], lang: str) -> list[dict]:
+    """
+    Card JSON for *words*. Items are validated one by one; malformed ones are
+    re-requested once (when they can be matched to their input word) or dropped.
+    """
+    _push("Asking AI to create JSON card(s)…")
+    t0 = time.time()
 
     try:
-        items = json.loads(json_str)
-        _push(f"✔ Received {len(items)} card(s) from GPT")
-        print(f"Response JSON: {json_str}")
-        return items
+        raw_items = _request_cards(words, lang)
     except json.JSONDecodeError as e:
-        _push(f"❌ Card-maker JSON parse error: {e}")
-        raise RuntimeError(f"Card-maker JSON parse error: {e}")
-    
-def tts(word: str, lang: str) -> bytes:
+        _push(f"⚠ Card-maker JSON parse error, retrying: {e}")
+        try:
+            raw_items = _request_cards(words, lang)
+        except json.JSONDecodeError as e:
+            _push(f"❌ Card-maker JSON parse error: {e}")
+            raise RuntimeError(f"Card-maker JSON parse error: {e}")
+
+    items: list[dict] = []
+    bad: list[int] = []
+    for i, raw in enumerate(raw_items):
+        card = card_from_wire(raw)
+        if card is None:
+            bad.append(i)
+        else:
+            items.append(card)
+
+    if bad and len(raw_items) == len(words):
+        # rows come back in input order, so bad rows map to their words
+        retry_words = [words[i] for i in bad]
+        _push(f"Re-requesting {len(retry_words)} malformed card(s)…")
+        try:
+            retry = _request_cards(retry_words, lang)
+            items.extend(card for card in map(card_from_wire, retry) if card)
+        except json.JSONDecodeError as e:
+            print(f"[CARDMAKER] retry parse error, dropping {retry_words}: {e}")
+    elif bad:
+        print(f"[CARDMAKER] dropping {len(bad)} malformed item(s)")
+
+    elapsed = time.time() - t0
+    print(f"[CARDMAKER] {len(items)}/{len(words)} card(s) (took {elapsed:.2f}s)")
+    if not items:
+        raise RuntimeError("Card maker returned no valid cards")
+
+    _push(f"✔ Received {len(items)} card(s) from GPT")
+    return items
+
+def tts(word: str, lang: str, *, push: bool = True) -> bytes:
     prompt = word.strip()
     if not prompt:
         raise ValueError("Word must be non-empty")
@@ -88,10 +186,11 @@ def tts(word: str, lang: str) -> bytes:
         f"The language is {lang}."
     )
 
-    _push(f"Generating TTS for “{word}”…")
+    if push:
+        _push(f"Generating TTS for “{word}”…")
     t0 = time.time()
 
-    response = client.audio.speech.create(
+    response = _client().audio.speech.create(
         model           = TTS_MODEL,
         input           = prompt,
         voice           = TTS_VOICE,
@@ -101,6 +200,9 @@ def tts(word: str, lang: str) -> bytes:
     )
 
     elapsed = time.time() - t0
-    _push(f"✔ TTS ready ({elapsed:.2f}s)")
+    if push:
+        _push(f"✔ TTS ready ({elapsed:.2f}s)")
+    else:
+        print(f"[TTS] “{word}” ready ({elapsed:.2f}s)")
 
     return response.content
\ No newline at end of file
@@ -0,0 +1,119 @@
+"""Perceptual-hash (dHash) de-duplication of image candidates and stored media."""
+from __future__ import annotations
+import io
+from functools import lru_cache
+
+import eventlet
+import requests
+
+from .cache import DiskCache
+
+HASH_SIZE = 8           # 8×8 → 64-bit hash
+MAX_DISTANCE = 6        # Hamming distance at or below which two images are "the same"
+MIN_WIDTH = 320         # smallest copy still good enough for a card
+THUMB_POOL_SIZE = 6
+HASH_BUDGET_S = 4       # total time for thumbnail hashing; unhashed images count as unique
+
+
+def dhash(raw: bytes) -> int | None:
+    """Difference hash of an image, or ``None`` if Pillow can't decode it."""
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(raw)) as img:
+            img.draft("L", (64, 64))    # JPEGs decode at reduced size
+            small = img.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS)
+            px = list(small.getdata())
+    except Exception:
+        return None
+
+    bits = 0
+    for row in range(HASH_SIZE):
+        for col in range(HASH_SIZE):
+            left = px[row * (HASH_SIZE + 1) + col]
+            right = px[row * (HASH_SIZE + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+
+def distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def _hash_url(url: str) -> int | None:
+    try:
+        res = requests.get(url, timeout=10)
+        res.raise_for_status()
+        return dhash(res.content)
+    except Exception:
+        return None
+
+
+def collapse_duplicates(images: list[dict]) -> list[dict]:
+    """
+    Group near-identical CSE results by the dHash of their small thumbnails
+    and keep one per group: the smallest copy at least ``MIN_WIDTH`` wide,
+    else the widest. Order follows each group's best-ranked member.
+    Hashing stops after ``HASH_BUDGET_S``; slower thumbnails stay unhashed.
+    """
+    pool = eventlet.GreenPool(THUMB_POOL_SIZE)
+    hashes: list[int | None] = [None] * len(images)
+
+    def job(i: int) -> None:
+        if images[i]["thumb"]:
+            hashes[i] = _hash_url(images[i]["thumb"])
+
+    threads = [pool.spawn(job, i) for i in range(len(images))]
+    with eventlet.Timeout(HASH_BUDGET_S, False):
+        pool.waitall()
+    for gt in threads:
+        gt.kill()
+
+    groups: list[tuple[int | None, list[dict]]] = []
+    for img, h in zip(images, hashes):
+        for gh, members in groups:
+            if h is not None and gh is not None and distance(h, gh) <= MAX_DISTANCE:
+                members.append(img)
+                break
+        else:
+            groups.append((h, [img]))
+
+    def pick(members: list[dict]) -> dict:
+        ok = [m for m in members if m["width"] >= MIN_WIDTH]
+        if ok:
+            return min(ok, key=lambda m: m["size"] or float("inf"))
+        return max(members, key=lambda m: m["width"])
+
+    return [pick(members) for _, members in groups]
+
+
+class MediaIndex:
+    """
+    Persistent map from image hash to a media file already stored in Anki,
+    so a near-identical image is referenced instead of uploaded again.
+    """
+
+    def __init__(self, store: DiskCache) -> None:
+        self.store = store
+
+    def find(self, h: int) -> str | None:
+        best, best_d = None, MAX_DISTANCE + 1
+        for key, fname in (self.store.get("media") or {}).items():
+            d = distance(h, int(key, 16))
+            if d < best_d:
+                best, best_d = fname, d
+        return best
+
+    def add(self, h: int, fname: str) -> None:
+        media = self.store.get("media") or {}
+        media[f"{h:016x}"] = fname
+        self.store.set("media", media)
+
+    def forget(self, fname: str) -> None:
+        media = self.store.get("media") or {}
+        self.store.set("media", {k: v for k, v in media.items() if v != fname})
+
+
+@lru_cache(maxsize=1)
+def media_index() -> MediaIndex:
+    return MediaIndex(DiskCache("image_hashes"))
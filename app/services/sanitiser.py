@@ -0,0 +1,90 @@
+"""Local, deterministic pre-sanitiser for pasted word lists.
+
+Handles the common cases (separators, bullets/numbering, whitespace, Unicode
+normalisation, de-duplication) without a model call. Anything it can't split
+with confidence is returned as *ambiguous* for the LLM sanitiser.
+"""
+from __future__ import annotations
+import re
+import unicodedata
+
+# ":" and "/" usually pair a word with its translation ("Hund/dog", "hund: dog"),
+# so fragments containing them are left whole for the model
+SEPARATORS = re.compile(r"[,;\n\r\t|]+")
+BULLET     = re.compile(r"^\s*(?:\(?\d+[.)\]]|[-*•·–—►▪◦+]+)\s+")
+INVISIBLE  = re.compile(r"[\u200b-\u200f\u2060\ufeff\u00ad]")
+EDGE_PUNCT = " .!?\"'“”„«»‘’`()[]{}"
+
+# a "word" is letters plus inner hyphens/apostrophes, e.g. "co-op", "d'accord"
+WORD = re.compile(r"^[^\W\d_]+(?:[-'’][^\W\d_]+)*$")
+
+
+def _script(ch: str) -> str:
+    """Coarse script of a letter: first word of its Unicode name (LATIN, CYRILLIC…)."""
+    try:
+        return unicodedata.name(ch).split(" ", 1)[0]
+    except ValueError:
+        return ""
+
+
+def _is_clean(token: str) -> bool:
+    """
+    Single words, or an English infinitive ("to run"), in a single script.
+    Multi-word runs like "couch truck" or glued scripts ("runяблык") are left
+    for the model to split.
+    """
+    words = token.split(" ")
+    if len(words) == 2 and words[0].lower() == "to":
+        words = words[1:]
+    if len(words) != 1 or not WORD.match(words[0]):
+        return False
+    scripts = {_script(ch) for ch in words[0] if ch.isalpha()}
+    return len(scripts) == 1
+
+
+def normalise(token: str) -> str:
+    token = unicodedata.normalize("NFC", INVISIBLE.sub("", token))
+    token = " ".join(token.split())
+    return token.strip(EDGE_PUNCT)
+
+
+def dedupe(tokens: list[str]) -> list[str]:
+    """Case-insensitive de-duplication keeping the first spelling and order."""
+    seen: set[str] = set()
+    out: list[str] = []
+    for tok in tokens:
+        key = tok.casefold()
+        if tok and key not in seen:
+            seen.add(key)
+            out.append(tok)
+    return out
+
+
+def presanitise(raw: str) -> tuple[list[str], list[str]]:
+    """Split *raw* into ``(clean tokens, ambiguous fragments)``."""
+    clean: list[str] = []
+    ambiguous: list[str] = []
+    for line in raw.splitlines():
+        line = BULLET.sub("", line)
+        for frag in SEPARATORS.split(line):
+            tok = normalise(BULLET.sub("", frag))
+            if not tok:
+                continue
+            (clean if _is_clean(tok) else ambiguous).append(tok)
+    return dedupe(clean), dedupe(ambiguous)
+
+
+def chunk(fragments: list[str], max_chars: int) -> list[list[str]]:
+    """Group fragments into chunks whose joined length stays under *max_chars*."""
+    chunks: list[list[str]] = []
+    cur: list[str] = []
+    size = 0
+    for frag in fragments:
+        if cur and size + len(frag) + 2 > max_chars:
+            chunks.append(cur)
+            cur, size = [], 0
+        cur.append(frag)
+        size += len(frag) + 2
+    if cur:
+        chunks.append(cur)
+    return chunks
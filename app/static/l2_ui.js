@@ -11,6 +11,30 @@ socket.on("progress", msg => L2Overlay.show(msg));
 socket.on("done",      data => {
   window.location.href = data.next;
 });
+socket.on("failed",    async data => {
+  L2Overlay.hide();
+  if (!data.resumable) {
+    alert(data.error);
+    return;
+  }
+  if (!confirm(`${data.error}\n\nResume this import from its last completed step?`)) return;
+  L2Overlay.show("Resuming import…");
+  const url = new URL("/batch/resume", window.location.origin);
+  url.searchParams.set("job", data.job);
+  if (mySid) url.searchParams.set("sid", mySid);
+  try {
+    const resp = await fetch(url, { method: "POST" });
+    if (!resp.ok) {
+      const body = await resp.json().catch(() => ({}));
+      L2Overlay.hide();
+      alert(body.error || `Resume failed (${resp.status}).`);
+    }
+  } catch (err) {
+    console.error(err);
+    L2Overlay.hide();
+    alert("Resume request failed.");
+  }
+});
 
 (function () {
   // ---------- overlay ----------
@@ -1,5 +1,7 @@
 document.addEventListener('DOMContentLoaded', () => {
   const max       = 3;
+  const form      = document.getElementById('f');
+  const title     = document.getElementById('title');
   const grid      = document.getElementById('grid');
   const btn       = document.getElementById('btn');
   const fileInput = document.getElementById('file');
@@ -7,10 +9,26 @@ document.addEventListener('DOMContentLoaded', () => {
   const recBtn    = document.getElementById('recBtn');
   const audioB64  = document.getElementById('audio_b64');
 
+  const sid       = form.dataset.sid;
+  const lookahead = Number(form.dataset.lookahead || 3);
+  let   curIdx    = Number(form.dataset.idx || 0);
+  let   total     = Infinity;
+  let   queue     = [];                 // card states from /picker/api/state, queue[0] = current
+  let   posting   = Promise.resolve();  // keep/skip POSTs are chained so idx stays in step
+  const preloaded = new Set();
+
   let mediaRec = null;
   let chunks   = [];
+  let recBlob  = null;   // sent as a binary multipart part, not a data URL
 
   /* —————— recording logic —————— */
+  const resetRecorder = () => {
+    recBlob = null;
+    audioB64.value = '';
+    recBtn.textContent = '🎤 Record';
+    recBtn.classList.remove('success');
+  };
+
   recBtn.addEventListener('click', async () => {
     if (!mediaRec) {
       // start
@@ -26,11 +44,7 @@ document.addEventListener('DOMContentLoaded', () => {
             mediaRec = null;
             return;
           }
-          const reader = new FileReader();
-          reader.onloadend = () => {
-            audioB64.value = reader.result;
-          };
-          reader.readAsDataURL(blob);
+          recBlob = blob;
 
           mediaRec = null;
           recBtn.textContent = '🎤 Re-record';
@@ -55,7 +69,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
   const updateBtn = () => {
     btn.disabled = currentCount() === 0;
-    if (currentCount() === max) document.getElementById('f').submit();
+    if (currentCount() === max) submitStep('keep');
   };
 
   const toggleBox = (box, img) => {
@@ -65,11 +79,13 @@ document.addEventListener('DOMContentLoaded', () => {
     updateBtn();
   };
 
-  grid.querySelectorAll('label').forEach(lbl => {
-    const box = lbl.querySelector('input');
-    const img = lbl.querySelector('img');
-    lbl.addEventListener('click', () => toggleBox(box, img));
-  });
+  const bindGrid = () => {
+    grid.querySelectorAll('label').forEach(lbl => {
+      const box = lbl.querySelector('input');
+      const img = lbl.querySelector('img');
+      lbl.addEventListener('click', () => toggleBox(box, img));
+    });
+  };
 
   const previewFiles = (files) => {
     [...files].forEach(f => {
@@ -117,5 +133,136 @@ document.addEventListener('DOMContentLoaded', () => {
     if (imgs.length) addNewFiles(imgs);
   });
 
+  /* —————— in-place card switching via the JSON API —————— */
+  const apiUrl = (path, params = {}) => {
+    const url = new URL(`/picker/api/${path}`, window.location.origin);
+    url.searchParams.set('sid', sid);
+    Object.entries(params).forEach(([k, v]) => url.searchParams.set(k, v));
+    return url;
+  };
+
+  // warm the browser cache for upcoming cards' thumbnails
+  const preload = (cards) => {
+    cards.forEach(c => (c.thumbs || []).forEach(u => {
+      if (preloaded.has(u)) return;
+      preloaded.add(u);
+      new Image().src = u;
+    }));
+  };
+
+  // true if the queue was updated; a job the server no longer knows
+  // (finished, or the server restarted) sends the user back to the start
+  const refresh = async () => {
+    let resp;
+    try {
+      resp = await fetch(apiUrl('state', { ahead: lookahead }));
+    } catch (err) {
+      console.error(err);
+      return false;
+    }
+    if (resp.status === 404) {
+      window.location.href = '/';
+      return false;
+    }
+    if (!resp.ok) {
+      console.error(`picker state failed: ${resp.status}`);
+      return false;
+    }
+    const state = await resp.json();
+    total = state.total;
+    // only keep cards at or past where the user already is
+    queue = state.cards.filter(c => c.idx >= curIdx);
+    preload(queue.slice(1));
+    return true;
+  };
+
+  const render = (card) => {
+    const heading = `${card.word} (${card.trans}, ${card.gram})`;
+    title.textContent = `${heading} – choose up to 3 images`;
+    document.title = `Choose images – ${card.word}`;
+    grid.replaceChildren(...card.thumbs.map(u => {
+      const label = document.createElement('label');
+      const input = document.createElement('input');
+      input.type = 'checkbox'; input.name = 'url'; input.value = u; input.hidden = true;
+      const img = document.createElement('img'); img.src = u;
+      label.append(input, img);
+      return label;
+    }));
+    bindGrid();
+    fileInput.value = '';
+    resetRecorder();
+    updateBtn();
+  };
+
+  // show card curIdx, waiting for its prefetch if needed; after a while give
+  // up on thumbnails and render an empty grid (uploads/paste still work),
+  // or, if the card itself never arrived, fall back to the server-rendered page
+  const showCurrent = async () => {
+    const giveUp = Date.now() + 30000;
+    while (true) {
+      const card = queue.find(c => c.idx === curIdx);
+      if (card && (card.thumbs !== null || Date.now() > giveUp)) {
+        L2Overlay.hide();
+        render({ ...card, thumbs: card.thumbs || [] });
+        return;
+      }
+      if (Date.now() > giveUp) {
+        window.location.reload();
+        return;
+      }
+      L2Overlay.show('Loading next card…');
+      await new Promise(r => setTimeout(r, 500));
+      await posting;
+      await refresh();
+    }
+  };
+
+  // server says we're out of step (409): jump to its card and redraw
+  const resync = async (idx) => {
+    console.warn(`picker out of step, resyncing to card ${idx}`);
+    curIdx = idx;
+    queue  = [];
+    await refresh();
+    await showCurrent();
+  };
+
+  let stepping = false;
+  function submitStep(action) {
+    if (stepping) return;
+    stepping = true;
+
+    const body = new FormData(form);
+    body.set('action', action);
+    body.set('idx', curIdx);
+    body.delete('audio_b64');
+    if (recBlob) body.set('audio', recBlob, 'recording.webm');
+
+    posting = posting
+      .then(() => fetch(apiUrl('step'), { method: 'POST', body }))
+      .then(resp => resp.json())
+      .then(res => {
+        if (res.done) window.location.href = '/';
+        else if (res.error && res.idx !== undefined) resync(res.idx);
+        else if (res.error) console.error(res);
+      })
+      .catch(err => console.error(err));
+
+    curIdx += 1;
+    if (curIdx >= total) {
+      L2Overlay.show('Saving…');
+      return;
+    }
+    queue = queue.filter(c => c.idx >= curIdx);
+    posting.then(refresh);
+    showCurrent().finally(() => { stepping = false; });
+  }
+
+  form.addEventListener('submit', e => {
+    e.preventDefault();
+    submitStep(e.submitter ? e.submitter.value : 'keep');
+  });
+
+  bindGrid();
   updateBtn();  // initialize
-});
\ No newline at end of file
+  refresh();
+});
@@ -1,42 +1,134 @@
+from ..config import settings
 from ..services.audio_service import get_audio_blob
-from ..services.image_service import google_thumbs
+from ..services.image_service import google_images, google_thumbs
+from ..services.phash import collapse_duplicates
 from ..services.openai_svc import tts
 from app.extensions import socketio
+import eventlet
+from eventlet.semaphore import Semaphore
 import time as _t
+from contextlib import contextmanager
+from typing import Iterator
 
 THUMB_CACHE = "thumb"
 RAW_CACHE = "thumb_raw"
 AUDIO_BLOB_CACHE = "audio_blob"
 AUDIO_CACHE = "audio"
+AUDIO_NAME_CACHE = "audio_name" # word -> media filename, stored in Anki by save_note
+AUDIO_SRC_CACHE = "audio_src"   # word -> "forvo" | "tts"
+
+# one lock per word so prefetch and the batch TTS stage never both
+# synthesise the same word; word -> [lock, holders + waiters]
+_AUDIO_LOCKS: dict[str, list] = {}
+
+
+@contextmanager
+def _audio_lock(word: str) -> Iterator[None]:
+    """Hold *word*'s lock; the entry is dropped once nobody holds or awaits it."""
+    entry = _AUDIO_LOCKS.setdefault(word, [Semaphore(1), 0])
+    entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if not entry[1]:
+            del _AUDIO_LOCKS[word]
+
+
+def _ensure_caches(caches: dict) -> None:
+    for key in (THUMB_CACHE, RAW_CACHE, AUDIO_BLOB_CACHE, AUDIO_CACHE,
+                AUDIO_NAME_CACHE, AUDIO_SRC_CACHE):
+        caches.setdefault(key, {})
+
+
+def _cache_audio(caches: dict, word: str, fname: str, blob: bytes, src: str) -> None:
+    """Keep audio in memory only; save_note uploads it if the card is kept."""
+    caches[AUDIO_BLOB_CACHE][word] = blob
+    caches[AUDIO_NAME_CACHE][word] = fname
+    caches[AUDIO_SRC_CACHE][word] = src
+
+
 def prefetch(anki, caches: dict, card_dict: dict, lang: str) -> None:
     word     = card_dict["base"]
     t_start  = _t.perf_counter()
 
-    for key in (THUMB_CACHE, RAW_CACHE, AUDIO_BLOB_CACHE, AUDIO_CACHE):
-        caches.setdefault(key, {})
+    _ensure_caches(caches)
 
-    # ---------- thumbnails (URLs only) ----------
-    thumbs = google_thumbs(card_dict["keyword"])
+    # ---------- thumbnails (URLs only, near-duplicates collapsed) ----------
+    images = google_images(card_dict["keyword"])
+    thumbs = [img["link"] for img in collapse_duplicates(images)]
     caches[THUMB_CACHE][word] = thumbs
     socketio.emit("progress",
-                  f"Cached {len(thumbs)} thumbnail URL(s) for “{word}”")
+                  f"Cached {len(thumbs)} thumbnail URL(s) for “{word}” "
+                  f"({len(images) - len(thumbs)} near-duplicate(s) dropped)")
 
     # ---------- audio ----------
-    fname, blob = get_audio_blob(lang, word)
-    if not blob:
-        blob  = tts(word, lang)
-        fname = f"{word}.mp3"
-        socketio.emit("progress", "Generated TTS audio")
-    else:
-        socketio.emit("progress", "Fetched audio from Forvo")
-
-    caches[AUDIO_BLOB_CACHE][word] = blob or b""
-    if blob:
-        media = anki.store_media(fname, blob)
-        caches[AUDIO_CACHE][word] = f"[sound:{media}]"
+    with _audio_lock(word):
+        src = caches[AUDIO_SRC_CACHE].get(word)
+        if src != "forvo":
+            # Forvo lookups are disk-cached, so this is cheap for known misses
+            fname, blob = get_audio_blob(lang, word)
+            if blob:
+                _cache_audio(caches, word, fname, blob, "forvo")
+                socketio.emit("progress", "Fetched audio from Forvo")
+            elif src == "tts":
+                socketio.emit("progress", "Using pre-generated TTS audio")
+            else:
+                blob = tts(word, lang)
+                _cache_audio(caches, word, f"{word}.mp3", blob, "tts")
+                socketio.emit("progress", "Generated TTS audio")
+
+    caches[AUDIO_BLOB_CACHE].setdefault(word, b"")
 
     print(f"[timing] prefetch({word}) total {_t.perf_counter()-t_start:5.3f}s")
 
+
+def _pregen_one(caches: dict, word: str, lang: str, mode: str) -> str:
+    with _audio_lock(word):
+        if word in caches[AUDIO_SRC_CACHE]:
+            return "cached"
+        if mode == "misses":
+            fname, blob = get_audio_blob(lang, word)
+            if blob:
+                _cache_audio(caches, word, fname, blob, "forvo")
+                return "forvo"
+        _cache_audio(caches, word, f"{word}.mp3", tts(word, lang, push=False), "tts")
+        return "tts"
+
+
+def pregenerate_tts(anki, caches: dict, cards: list[dict], lang: str) -> None:
+    """
+    Batch-level audio stage: synthesise TTS for every card (``TTS_PREGEN=all``)
+    or every Forvo miss (``misses``) with bounded concurrency. Cards are
+    started in picker order so the next ones are ready first.
+    """
+    mode = settings.TTS_PREGEN
+    if mode not in ("all", "misses"):
+        return
+
+    _ensure_caches(caches)
+    t_start = _t.perf_counter()
+    pool = eventlet.GreenPool(size=settings.TTS_CONCURRENCY)
+
+    def job(card: dict) -> tuple[str, str]:
+        word = card["base"]
+        try:
+            return word, _pregen_one(caches, word, lang, mode)
+        except Exception as exc:
+            # prefetch will retry this word when the picker reaches it
+            print(f"[TTS] pregen {word} failed: {exc}")
+            return word, "failed"
+
+    counts: dict[str, int] = {}
+    for word, outcome in pool.imap(job, cards):
+        counts[outcome] = counts.get(outcome, 0) + 1
+        print(f"[TTS] pregen {word}: {outcome}")
+
+    print(f"[timing] pregenerate_tts({len(cards)} cards, {mode}) "
+          f"{_t.perf_counter()-t_start:5.3f}s {counts}")
+
+
 def load_live_mode_content(anki, caches, card_dict, lang, word):
     caches[THUMB_CACHE][word] = google_thumbs(card_dict["keyword"])
     fname, blob = get_audio_blob(lang, word)
@@ -1,20 +1,48 @@
 from __future__ import annotations
 
 import base64
+import io
+import os
+import shutil
+import tempfile
 import uuid
 from pathlib import Path
 from urllib.parse import urlparse
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 
 import requests
 
 from ..models.card import CardData
+from ..services.audio_service import master_recording
+from ..services.phash import MAX_DISTANCE, dhash, distance, media_index
 
 import eventlet, time as _t
+from eventlet import tpool
 
 FETCH_POOL = eventlet.GreenPool(size=3)
 MAX_W = 640 
 AUDIO_MIME_EXT = {"audio/webm": ".webm", "audio/ogg": ".ogg", "audio/mpeg": ".mp3"}
+SPOOL_DIR = Path(tempfile.gettempdir()) / "l2-spool"
+
+
+def spool_upload(storage) -> str:
+    """
+    Stream an uploaded file (werkzeug ``FileStorage``) to a temp file in
+    chunks and return its path; save_note reads and removes it later.
+    """
+    SPOOL_DIR.mkdir(parents=True, exist_ok=True)
+    suffix = Path(storage.filename or "").suffix
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=SPOOL_DIR)
+    with os.fdopen(fd, "wb") as out:
+        shutil.copyfileobj(storage.stream, out, length=64 * 1024)
+    return path
+
+
+def _unspool(path: str) -> bytes:
+    try:
+        return Path(path).read_bytes()
+    finally:
+        Path(path).unlink(missing_ok=True)
 
 def _download_and_cache(url: str, caches: dict) -> tuple[str, bytes | None, float]:
     """Fetch a URL, validate it's an image, and cache the raw bytes."""
@@ -38,21 +66,46 @@ def _download_and_cache(url: str, caches: dict) -> tuple[str, bytes | None, floa
         elapsed = _t.perf_counter() - t0
         return url, None, elapsed
 
-def _stage_image(actions: List[dict], img_tags: List[str], raw: bytes, ext: str = ".jpg") -> None:
-    """Add storeMedia and img tag actions for a valid image."""
+def _stage_image(
+    actions: List[dict], img_tags: List[str], raw: bytes, ext: str = ".jpg",
+    *, anki=None, new_hashes: Dict[int, str] | None = None,
+) -> None:
+    """
+    Add storeMedia and img tag actions for a valid image (raw bytes; AnkiClient
+    encodes). A near-identical image already in the collection is referenced
+    instead of uploaded; one already on this note is skipped.
+    """
+    h = tpool.execute(dhash, raw)    # decoding a full-size photo blocks
+    if h is not None and new_hashes is not None:
+        if any(distance(h, other) <= MAX_DISTANCE for other in new_hashes):
+            return
+        hit = media_index().find(h)
+        if hit and anki is not None:
+            tag = f'<img src="{hit}">'
+            if tag in img_tags:
+                return
+            if anki.has_media(hit):
+                print(f"[SAVE] reusing stored image {hit}")
+                img_tags.append(tag)
+                return
+            media_index().forget(hit)    # deleted from the collection since
+
     fname = f"{uuid.uuid4().hex}{ext}"
-    b64 = base64.b64encode(raw).decode()
     actions.append({
         "action": "storeMediaFile",
-        "params": {"filename": fname, "data": b64},
+        "params": {"filename": fname, "data": raw},
     })
     img_tags.append(f'<img src="{fname}">')
+    if h is not None and new_hashes is not None:
+        new_hashes[h] = fname
 
 def _process_images(
     sel_urls: List[str],
-    uploads : List[Tuple[str, bytes]],
+    uploads : List[Tuple[str, str]],
     actions : List[dict],
     caches  : dict,
+    anki    = None,
+    new_hashes: Dict[int, str] | None = None,
 ) -> List[str]:
     img_tags: List[str] = []
     t_total = _t.perf_counter()
@@ -68,7 +121,7 @@ def _process_images(
         raw = caches.get("thumb_raw", {}).get(url, b"")
         if raw and len(img_tags) < 3:
             ext = Path(urlparse(url).path).suffix or ".jpg"
-            _stage_image(actions, img_tags, raw, ext)
+            _stage_image(actions, img_tags, raw, ext, anki=anki, new_hashes=new_hashes)
 
     for url in sel_urls:
         if len(img_tags) >= 3:
@@ -78,55 +131,83 @@ def _process_images(
         except Exception:
             continue
 
-    for name, data in uploads:
+    for name, path in uploads:
         if len(img_tags) >= 3:
             break
+        data = _unspool(path)
         if data[:2] == b"\xFF\xD8":                   # JPEG magic validation
             ext = Path(name).suffix or ".jpg"
-            _stage_image(actions, img_tags, data, ext)
+            _stage_image(actions, img_tags, data, ext, anki=anki, new_hashes=new_hashes)
 
     print(f"[timing] _process_images total {_t.perf_counter()-t_total:4.2f}s")
     return img_tags
 
 
-def _stage_user_audio(rec_b64: str, actions: List[dict]) -> str:
+def _stage_user_audio(rec_path: str, rec_b64: str, actions: List[dict]) -> str:
     """
-    Decode user audio and stage storeMedia action if present.
-    Returns an [sound:] tag or empty string.
+    Transcode the user's recording to mastered MP3 and stage a storeMedia
+    action. Takes a spooled upload (``rec_path``) or, from older clients, a
+    base64 data URL. Returns an [sound:] tag or empty string.
     """
-    if not rec_b64.startswith("data:audio"):
-        return ""
-    try:
-        header, b64data = rec_b64.split(",", 1)
-        raw = base64.b64decode(b64data)
-        if raw:
+    if rec_path:
+        src: str | io.BytesIO = rec_path
+        ext = Path(rec_path).suffix or ".webm"
+    elif rec_b64.startswith("data:audio"):
+        try:
+            header, b64data = rec_b64.split(",", 1)
+            src = io.BytesIO(base64.b64decode(b64data))
             mime = header.split(";")[0].split(":")[1]
             ext = AUDIO_MIME_EXT.get(mime, ".webm")
-            fname = f"{uuid.uuid4().hex}{ext}"
-            actions.append({
-                "action": "storeMediaFile",
-                "params": {"filename": fname, "data": b64data},
-            })
-            return f"[sound:{fname}]"
-    except Exception:
-        pass
-    return ""
+        except Exception:
+            return ""
+    else:
+        return ""
+
+    try:
+        # ffmpeg + pydub filters block; run them on a real thread, not the hub
+        raw, ext = tpool.execute(master_recording, src), ".mp3"
+    except Exception as err:
+        # no ffmpeg / odd container: store the recording as-is
+        print(f"[SAVE] recording transcode failed, storing {ext}: {err}")
+        raw = _unspool(rec_path) if rec_path else src.getvalue()
+    finally:
+        if rec_path:
+            Path(rec_path).unlink(missing_ok=True)
+    if not raw:
+        return ""
+
+    fname = f"{uuid.uuid4().hex}{ext}"
+    actions.append({
+        "action": "storeMediaFile",
+        "params": {"filename": fname, "data": raw},
+    })
+    return f"[sound:{fname}]"
 
 
 def save_note(
     *, deck: str, anki_model: str, anki, caches: dict,
     card_dict: dict, sel_urls: List[str],
-    uploads: List[Tuple[str, bytes]], rec_b64: str = "",
-    lang: str
+    uploads: List[Tuple[str, str]], rec_b64: str = "",
+    rec_path: str = "", lang: str
 ) -> None:
+    """
+    Build and send one note. ``uploads`` are ``(filename, spooled path)``
+    pairs from :func:`spool_upload`; spooled files are removed when done.
+    """
     card = CardData.from_dict(card_dict)
     actions: List[dict] = []
+    new_hashes: Dict[int, str] = {}
 
     print(f"[SAVE] Start deck={deck} word={card.base}")
 
-    full_audio = get_full_audio(caches, rec_b64, card, actions)
+    try:
+        full_audio = get_full_audio(caches, rec_path, rec_b64, card, actions)
+        img_tags = _process_images(sel_urls, uploads, actions, caches, anki, new_hashes)
+    finally:
+        for path in [rec_path, *(p for _, p in uploads)]:
+            if path:
+                Path(path).unlink(missing_ok=True)
 
-    img_tags = _process_images(sel_urls, uploads, actions, caches)
     if not img_tags:
         print(f"[SAVE] no valid images for '{card.base}', skipping.")
         return
@@ -148,11 +229,23 @@ def save_note(
     try:
         res = anki.multi(actions)
         print(f"[SAVE] result={res[-1]}")
+        for h, fname in new_hashes.items():
+            media_index().add(h, fname)
     except Exception as err:
         print(f"[SAVE] failed saving note: {err}")
 
-def get_full_audio(caches, rec_b64, card, actions):
-    user_tag = _stage_user_audio(rec_b64, actions)
-    cached_tag = caches.get("audio", {}).get(card.base, "")
+def get_full_audio(caches, rec_path, rec_b64, card, actions):
+    user_tag = _stage_user_audio(rec_path, rec_b64, actions)
+    blob = caches.get("audio_blob", {}).get(card.base)
+    name = caches.get("audio_name", {}).get(card.base)
+    if blob and name:
+        # prefetched audio is only uploaded for cards that are actually kept
+        actions.append({
+            "action": "storeMediaFile",
+            "params": {"filename": name, "data": blob},
+        })
+        cached_tag = f"[sound:{name}]"
+    else:
+        cached_tag = caches.get("audio", {}).get(card.base, "")
     full_audio = cached_tag + user_tag
     return full_audio
\ No newline at end of file
@@ -0,0 +1,395 @@
+"""Load-test harness: N simulated learners against local service stand-ins.
+
+Starts a stand-in server for AnkiConnect, Google CSE, Forvo and the OpenAI
+API (with configurable latencies), launches the app pointed at it, then runs
+waves of simulated users at increasing concurrency. Each user connects over
+Socket.IO, starts a batch through ``/batch/``, waits for ``done`` and clicks
+through ``/picker/api/*`` with a think time between cards.
+
+Reports p50/p95/p99 latency and error rate per step and concurrency level,
+and the first level at which latency breaks down.
+
+    python scripts/loadtest.py --levels 1,2,4,8,16 --words 10 --think 0.5
+
+Use ``--target http://host:port`` to hit an already running app instead
+(it must be configured against the stand-ins or real services itself).
+Needs the Socket.IO client extras: ``pip install "python-socketio[client]"``.
+"""
+from __future__ import annotations
+import argparse
+import io
+import json
+import os
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import requests
+import socketio
+
+ROOT = Path(__file__).resolve().parent.parent
+
+STEPS = ("connect", "batch", "state", "card_wait", "step")
+
+
+# ────────── service stand-ins ─────────────────────────────────────
+def _fake_jpeg(seed: int) -> bytes:
+    """
+    A small real JPEG if Pillow is around, else just the magic bytes. Each
+    seed gets its own coarse noise pattern so the images have distinct dHashes.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return b"\xFF\xD8\xFF\xE0" + bytes(2048) + b"\xFF\xD9"
+    rnd = random.Random(seed)
+    img = Image.new("RGB", (12, 12))
+    img.putdata([tuple(rnd.randrange(256) for _ in range(3)) for _ in range(144)])
+    img = img.resize((96, 96), Image.BILINEAR)
+    buf = io.BytesIO()
+    img.save(buf, "JPEG")
+    return buf.getvalue()
+
+
+class StandIns(BaseHTTPRequestHandler):
+    """One handler for every external service; latencies come from ``server.lat``."""
+
+    protocol_version = "HTTP/1.1"
+    anki_lock = threading.Lock()      # Anki handles one request at a time
+    note_ids = iter(range(1, 10**9))
+    images = {i: _fake_jpeg(i) for i in range(10)}
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _sleep(self, kind: str) -> None:
+        time.sleep(self.server.lat[kind] / 1000)
+
+    def _send(self, body: bytes, ctype: str = "application/json") -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, obj) -> None:
+        self._send(json.dumps(obj).encode())
+
+    def _body(self) -> dict:
+        n = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(n) or b"{}")
+
+    # ---------- GET: CSE, Forvo, image bytes ----------
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        base = f"http://{self.headers['Host']}"
+        if url.path.startswith("/cse"):
+            self._sleep("cse")
+            q = parse_qs(url.query).get("q", [""])[0]
+            # every word gets the same 10 pictures, a few of them "resized" copies
+            items = [{
+                "link": f"{base}/img/{i % 7}?q={q}&v={i}",
+                "image": {
+                    "thumbnailLink": f"{base}/img/{i % 7}",
+                    "byteSize": 20_000 + 1000 * i,
+                    "width": 400 + 10 * i,
+                    "height": 300,
+                },
+            } for i in range(10)]
+            self._json({"items": items})
+        elif url.path.startswith("/forvo"):
+            self._sleep("forvo")
+            self._json({"attributes": {"total": 0}, "items": []})
+        elif url.path.startswith("/img/"):
+            self._sleep("img")
+            n = int(url.path.rsplit("/", 1)[1])
+            self._send(self.images[n % len(self.images)], "image/jpeg")
+        else:
+            self.send_error(404)
+
+    # ---------- POST: AnkiConnect, OpenAI ----------
+    def do_POST(self) -> None:
+        path = urlparse(self.path).path
+        body = self._body()
+        if path.startswith("/anki"):
+            with self.anki_lock:
+                self._sleep("anki")
+                self._json({"result": self._anki(body), "error": None})
+        elif path.endswith("/chat/completions"):
+            self._sleep("llm")
+            self._json(self._chat(body))
+        elif path.endswith("/audio/speech"):
+            self._sleep("tts")
+            self._send(b"ID3" + bytes(4096), "audio/mpeg")
+        else:
+            self.send_error(404)
+
+    def _anki(self, req: dict):
+        action, params = req.get("action"), req.get("params", {})
+        if action == "multi":
+            return [self._anki(a) for a in params.get("actions", [])]
+        return {
+            "version": 6,
+            "deckNames": ["Default", "loadtest"],
+            "addNote": next(self.note_ids),
+            "storeMediaFile": params.get("filename"),
+            "retrieveMediaFileByHash": False,
+            "getMediaFilesNames": [],
+        }.get(action)
+
+    def _chat(self, req: dict) -> dict:
+        system, user = req["messages"][0]["content"], req["messages"][-1]["content"]
+        if "sanitizing" in system:
+            content = ";".join(t.strip() for t in user.replace(",", ";").split(";") if t.strip())
+        else:
+            content = json.dumps([{
+                "base": w, "grammar": "Noun", "translation": w,
+                "example": f"*{w}* here.", "example-translation": f"*{w}* here.",
+                "keyword": w,
+            } for w in (t.strip() for t in user.split(",")) if w])
+        return {
+            "id": "chatcmpl-loadtest", "object": "chat.completion", "created": 0,
+            "model": req.get("model", ""),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+        }
+
+
+def start_stand_ins(lat: dict) -> ThreadingHTTPServer:
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), StandIns)
+    srv.lat = lat
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+def launch_app(stub: str, port: int, cache_dir: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "ANKICONNECT_ENDPOINT": f"{stub}/anki",
+        "GOOGLE_CSE_ENDPOINT":  f"{stub}/cse",
+        "GOOGLE_CSE_KEY":       "loadtest",
+        "GOOGLE_CSE_CX":        "loadtest",
+        "FORVO_ENDPOINT":       f"{stub}/forvo",
+        "FORVO_API_KEY":        "loadtest",
+        "OPENAI_BASE_URL":      f"{stub}/v1",
+        "OPENAI_API_KEY":       "loadtest",
+        "CACHE_DIR":            cache_dir,
+    }
+    return subprocess.Popen(
+        [sys.executable, str(ROOT / "scripts" / "run.py"),
+         "--port", str(port), "--no-browser"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def wait_healthy(base: str, timeout: float = 30) -> None:
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        try:
+            if requests.get(f"{base}/health", timeout=1).json().get("anki"):
+                return
+        except Exception:
+            pass
+        time.sleep(0.25)
+    raise SystemExit(f"app at {base} did not become healthy in {timeout:.0f}s")
+
+
+# ────────── simulated user ────────────────────────────────────────
+class Recorder:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.lat: dict[str, list[float]] = defaultdict(list)
+        self.err: dict[str, int] = defaultdict(int)
+
+    def ok(self, step: str, dt: float) -> None:
+        with self.lock:
+            self.lat[step].append(dt)
+
+    def fail(self, step: str, why: str) -> None:
+        with self.lock:
+            self.err[step] += 1
+        print(f"  ! {step}: {why}", file=sys.stderr)
+
+
+def _word(rnd: random.Random) -> str:
+    return "".join(rnd.choice(string.ascii_lowercase) for _ in range(8))
+
+
+def simulate_user(base: str, uid: int, args, rec: Recorder) -> None:
+    rnd = random.Random(uid)
+    http = requests.Session()
+    sio = socketio.Client(reconnection=False)
+    done = threading.Event()
+    nxt: dict = {}
+
+    @sio.on("done")
+    def _done(data):
+        nxt.update(data)
+        done.set()
+
+    step = "connect"
+    try:
+        t0 = time.perf_counter()
+        sio.connect(base, wait_timeout=10)
+        sid = sio.get_sid()
+        rec.ok("connect", time.perf_counter() - t0)
+
+        step = "batch"
+        blob = ", ".join(_word(rnd) for _ in range(args.words))
+        t0 = time.perf_counter()
+        r = http.post(f"{base}/batch/", params={"sid": sid},
+                      data={"deck": "loadtest", "lang": "Danish", "blob": blob}, timeout=30)
+        r.raise_for_status()
+        if not done.wait(args.timeout):
+            raise TimeoutError("no 'done' event")
+        rec.ok("batch", time.perf_counter() - t0)
+
+        while True:
+            step = "card_wait"
+            t_wait = time.perf_counter()
+            while True:
+                step = "state"
+                t0 = time.perf_counter()
+                r = http.get(f"{base}/picker/api/state", params={"sid": sid}, timeout=30)
+                if r.status_code == 404:
+                    return                      # job finished
+                r.raise_for_status()
+                rec.ok("state", time.perf_counter() - t0)
+                state = r.json()
+                card = state["cards"][0]
+                if card["thumbs"] is not None:
+                    break
+                if time.perf_counter() - t_wait > args.timeout:
+                    raise TimeoutError(f"card {card['idx']} never ready")
+                time.sleep(0.1)
+            rec.ok("card_wait", time.perf_counter() - t_wait)
+
+            time.sleep(rnd.uniform(0.5, 1.5) * args.think)
+
+            step = "step"
+            keep = card["thumbs"] and rnd.random() < args.keep
+            data = {"idx": card["idx"], "action": "keep" if keep else "skip"}
+            if keep:
+                data["url"] = card["thumbs"][:rnd.randint(1, 3)]
+            t0 = time.perf_counter()
+            r = http.post(f"{base}/picker/api/step", params={"sid": sid}, data=data, timeout=30)
+            r.raise_for_status()
+            rec.ok("step", time.perf_counter() - t0)
+            if r.json().get("done"):
+                return
+    except Exception as exc:
+        rec.fail(step, f"user {uid}: {exc!r}")
+    finally:
+        if sio.connected:
+            sio.disconnect()
+
+
+# ────────── reporting ─────────────────────────────────────────────
+def pct(xs: list[float], p: float) -> float:
+    if not xs:
+        return float("nan")
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(p / 100 * (len(xs) - 1))))]
+
+
+def run_level(base: str, n: int, args) -> Recorder:
+    rec = Recorder()
+    users = [threading.Thread(target=simulate_user, args=(base, n * 1000 + i, args, rec))
+             for i in range(n)]
+    for u in users:
+        u.start()
+        time.sleep(args.ramp)
+    for u in users:
+        u.join()
+    return rec
+
+
+def report(results: dict[int, Recorder], args) -> None:
+    print(f"\n{'users':>5} {'step':<10} {'n':>5} {'err%':>6} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for n, rec in results.items():
+        for step in STEPS:
+            xs, errs = rec.lat[step], rec.err[step]
+            total = len(xs) + errs
+            if not total:
+                continue
+            print(f"{n:>5} {step:<10} {total:>5} {100 * errs / total:>6.1f} "
+                  f"{1000 * pct(xs, 50):>8.0f} {1000 * pct(xs, 95):>8.0f} "
+                  f"{1000 * pct(xs, 99):>8.0f}")
+
+    # breakdown: first level where an interactive step's p95 blows past the
+    # single-user baseline, or errors exceed the budget
+    levels = list(results)
+    base = results[levels[0]]
+    for n in levels[1:]:
+        rec = results[n]
+        for step in ("state", "step", "card_wait", "batch"):
+            b95, p95 = pct(base.lat[step], 95), pct(rec.lat[step], 95)
+            total = len(rec.lat[step]) + rec.err[step]
+            err_rate = rec.err[step] / total if total else 0.0
+            if p95 > args.slo_factor * b95 or err_rate > args.max_err:
+                print(f"\nLatency breaks down at {n} concurrent users: "
+                      f"{step} p95 {1000 * p95:.0f} ms vs {1000 * b95:.0f} ms baseline, "
+                      f"{100 * err_rate:.1f}% errors")
+                return
+    print(f"\nNo breakdown up to {levels[-1]} concurrent users "
+          f"(threshold {args.slo_factor}× baseline p95, {100 * args.max_err:.0f}% errors)")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--levels", default="1,2,4,8", help="comma-separated user counts")
+    ap.add_argument("--words", type=int, default=8, help="words per simulated batch")
+    ap.add_argument("--think", type=float, default=1.0, help="mean think time per card (s)")
+    ap.add_argument("--keep", type=float, default=0.8, help="share of cards kept vs skipped")
+    ap.add_argument("--ramp", type=float, default=0.05, help="delay between user starts (s)")
+    ap.add_argument("--timeout", type=float, default=120, help="per-wait timeout (s)")
+    ap.add_argument("--slo-factor", type=float, default=3.0)
+    ap.add_argument("--max-err", type=float, default=0.05)
+    ap.add_argument("--target", help="use an already running app instead of launching one")
+    ap.add_argument("--port", type=int, default=5051)
+    for kind, ms in (("anki", 20), ("llm", 800), ("tts", 400), ("cse", 300),
+                     ("forvo", 200), ("img", 50)):
+        ap.add_argument(f"--{kind}-ms", type=float, default=ms,
+                        help=f"stand-in {kind} latency (default {ms} ms)")
+    args = ap.parse_args()
+    levels = [int(x) for x in args.levels.split(",")]
+
+    proc = None
+    if args.target:
+        base = args.target.rstrip("/")
+    else:
+        lat = {k: getattr(args, f"{k}_ms") for k in ("anki", "llm", "tts", "cse", "forvo", "img")}
+        stub = start_stand_ins(lat)
+        stub_url = f"http://127.0.0.1:{stub.server_address[1]}"
+        cache_dir = tempfile.mkdtemp(prefix="l2-loadtest-")
+        proc = launch_app(stub_url, args.port, cache_dir)
+        base = f"http://127.0.0.1:{args.port}"
+        print(f"stand-ins at {stub_url}, app at {base} (cache {cache_dir})")
+
+    try:
+        wait_healthy(base)
+        results: dict[int, Recorder] = {}
+        for n in levels:
+            print(f"→ {n} concurrent user(s)…")
+            t0 = time.perf_counter()
+            results[n] = run_level(base, n, args)
+            print(f"  finished in {time.perf_counter() - t0:.1f}s")
+        report(results, args)
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,13 @@
 """Dev entrypoint: launches the Flask-SocketIO server and opens the browser."""
+# Patch before anything opens a socket: requests, the OpenAI SDK (httpx) and
+# time.sleep must yield to the eventlet hub, or every background task blocks
+# all request handling.
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
 import sys
+import time
 import webbrowser
 from pathlib import Path
 from threading import Timer
@@ -7,18 +15,30 @@ from threading import Timer
 ROOT = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(ROOT))
 
+_t0 = time.perf_counter()
 from app.factory import create_app
 from app.extensions import socketio
+print(f"[timing] app import {time.perf_counter()-_t0:5.3f}s "
+      "(run with `python -X importtime` for a per-module breakdown)")
 
 def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--port", type=int, default=5001)
+    ap.add_argument("--no-browser", action="store_true",
+                    help="don't open a browser tab (e.g. under scripts/loadtest.py)")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
     app = create_app()
+    print(f"[timing] create_app {time.perf_counter()-t0:5.3f}s")
 
-    Timer(1.0, lambda: webbrowser.open("http://127.0.0.1:5001")).start()
+    if not args.no_browser:
+        Timer(1.0, lambda: webbrowser.open(f"http://127.0.0.1:{args.port}")).start()
 
     socketio.run(
         app,
         host="0.0.0.0",
-        port=5001,
+        port=args.port,
         debug=True,               # false for prod
         use_reloader=False        # prevent double-launch
     )